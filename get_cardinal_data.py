@@ -1,10 +1,41 @@
+import atexit
+import codecs
+import functools
+import time
+
+import duckdb
 import httpx
+import lxml.etree
+import lxml.html
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
+import pyarrow as pa
 from pathlib import Path
-from io import StringIO
+from io import BytesIO
 
 CACHE_FILE = Path("cardinals_page.html")
+ETAG_FILE = Path("cardinals_page.etag")
+DUCKDB_FILE = Path("papal_data.duckdb")
+PARQUET_CACHE_FILE = Path("cardinals_page.parquet")
+PARQUET_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# Shared client so repeated fetches reuse the pooled (HTTP/2) connection
+_CLIENT = httpx.Client(
+    http2=True,
+    follow_redirects=True,
+    headers={"User-Agent": "conclave/1.0"},
+    timeout=30.0,
+)
+atexit.register(_CLIENT.close)
+
+# Wikipedia marks cardinals who are no longer electors with a pink row background
+INELIGIBLE_STYLES = ("background:#FFCCCC", "background-color:#FFCCCC")
+# The page cache is always UTF-8, so decode it explicitly rather than relying
+# on the document carrying a <meta charset>
+HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+WIKITABLE_XPATH = lxml.etree.XPath(
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' wikitable ')]"
+)
 
 
 def flatten_col(col):
@@ -17,54 +48,186 @@ def flatten_col(col):
         return str(col).strip().replace(" ", "_").lower()
 
 
+def _table_cache_age() -> float | None:
+    """Seconds since the Parquet table was written, or None if there is none."""
+    if not PARQUET_CACHE_FILE.exists():
+        return None
+    return time.time() - PARQUET_CACHE_FILE.stat().st_mtime
+
+
 def get_cardinals_data(force_refresh: bool = False):
     """
     Fetches and parses the list of current cardinals from Wikipedia,
-    caching the page content unless force_refresh is True.
+    caching the parsed table (and the raw page) unless force_refresh is True.
+
+    A cached table older than PARQUET_CACHE_TTL is revalidated with a
+    conditional GET; if Wikipedia cannot be reached or answers with an error
+    status (e.g. a 429 or 5xx) it is served as is.
 
     Args:
-        force_refresh: If True, bypass the cache and fetch the page again.
+        force_refresh: If True, bypass the caches and fetch the page again.
 
     Returns:
         A pandas DataFrame containing the cardinals data.
     """
 
-    if force_refresh or not CACHE_FILE.exists():
+    table_age = _table_cache_age()
+    table_stale = table_age is not None and table_age > PARQUET_CACHE_TTL
+    if not force_refresh and table_age is not None and not table_stale:
+        print("Table loaded from cache.")
+        return pd.read_parquet(PARQUET_CACHE_FILE, dtype_backend="pyarrow")
+
+    etag = None
+    if force_refresh or table_stale or not CACHE_FILE.exists():
         url = "https://en.wikipedia.org/wiki/List_of_current_cardinals"
-        resp = httpx.get(url)
-        resp.raise_for_status()
-        html = resp.text
-        CACHE_FILE.write_text(html, encoding="utf-8")
-        print("Page fetched and cached.")
+        headers = {}
+        if not force_refresh and CACHE_FILE.exists() and ETAG_FILE.exists():
+            # Conditional GET: Wikipedia answers 304 if the page is unchanged.
+            # force_refresh skips it so the table is always re-parsed.
+            headers["If-None-Match"] = ETAG_FILE.read_text(encoding="utf-8")
+        try:
+            resp = _CLIENT.get(url, headers=headers)
+            if resp.status_code != httpx.codes.NOT_MODIFIED:
+                resp.raise_for_status()
+        except httpx.HTTPError:
+            if force_refresh or not table_stale:
+                raise
+            print("Could not refresh from Wikipedia; stale table loaded from cache.")
+            return pd.read_parquet(PARQUET_CACHE_FILE, dtype_backend="pyarrow")
+        if resp.status_code == httpx.codes.NOT_MODIFIED:
+            if PARQUET_CACHE_FILE.exists():
+                PARQUET_CACHE_FILE.touch()
+                print("Page not modified; table loaded from cache.")
+                return pd.read_parquet(PARQUET_CACHE_FILE, dtype_backend="pyarrow")
+            html = CACHE_FILE.read_bytes()
+            print("Page not modified; loaded from cache.")
+        else:
+            # Keep the raw bytes so the page is not round-tripped through str,
+            # transcoding only if the server sent something other than UTF-8
+            html = resp.content
+            charset = resp.charset_encoding
+            if charset and codecs.lookup(charset).name != "utf-8":
+                html = resp.text.encode("utf-8")
+            # Drop the old ETag and table first: until the new page has been
+            # parsed, a 304 must not hand back a table built from the old one
+            ETAG_FILE.unlink(missing_ok=True)
+            PARQUET_CACHE_FILE.unlink(missing_ok=True)
+            CACHE_FILE.write_bytes(html)
+            etag = resp.headers.get("ETag")
+            print("Page fetched and cached.")
     else:
-        html = CACHE_FILE.read_text(encoding="utf-8")
+        html = CACHE_FILE.read_bytes()
         print("Page loaded from cache.")
 
-    soup = BeautifulSoup(html, "html.parser")
-    tables = soup.find_all("table", {"class": "wikitable"})
+    cardinals = parse_cardinals_html(html)
+    cardinals.to_parquet(PARQUET_CACHE_FILE, engine="pyarrow", compression="zstd")
+    if etag:
+        ETAG_FILE.write_text(etag, encoding="utf-8")
+    return cardinals
+
+
+def parse_cardinals_html(html: bytes) -> pd.DataFrame:
+    """
+    Parses the cardinals tables out of the Wikipedia page HTML.
+
+    Args:
+        html: The page content as UTF-8 bytes.
+
+    Returns:
+        A pandas DataFrame with one row per table row and flattened columns.
+    """
+
+    tree = lxml.html.fromstring(html, parser=HTML_PARSER)
+    tables = WIKITABLE_XPATH(tree)
+
+    # Parse all tables in one read_html call; pandas' exact-match `attrs`
+    # filter would miss "wikitable sortable", so feed it just the wikitables
+    all_dfs = pd.read_html(
+        BytesIO(
+            b"".join(
+                lxml.html.tostring(table, encoding="utf-8", with_tail=False)
+                for table in tables
+            )
+        ),
+        flavor="lxml",
+        encoding="utf-8",
+        dtype_backend="pyarrow",
+    )
 
     cardinals_dfs = []
-    for table in tables:
-        # Use StringIO to avoid FutureWarning
-        df = pd.read_html(StringIO(str(table)))[0]
-        # Determine eligibility by inspecting each row's style
-        eligibility = []
-        for row in table.find_all("tr"):
-            style = row.get("style", "")
-            if "background:#FFCCCC" in style or "background-color:#FFCCCC" in style:
-                eligibility.append(False)
-            else:
-                eligibility.append(True)
-        eligibility = eligibility[1:]  # Skip header row
+    for table, df in zip(tables, all_dfs):
+        # Determine eligibility from each row's style, skipping the header row
+        styles = np.array(
+            [row.get("style", "") for row in table.iter("tr")][1:], dtype=str
+        )
+        eligibility = np.ones(len(styles), dtype=bool)
+        for marker in INELIGIBLE_STYLES:
+            eligibility &= np.char.find(styles, marker) < 0
         if len(eligibility) == len(df):
             df["eligible"] = eligibility
         cardinals_dfs.append(df)
 
-    cardinals = pd.concat(cardinals_dfs, ignore_index=True)
+    if len(cardinals_dfs) == 1:
+        cardinals = cardinals_dfs[0].reset_index(drop=True)
+    else:
+        cardinals = pd.concat(cardinals_dfs, ignore_index=True, sort=False)
+    # Tables missing a column leave NaN-filled object columns after the concat
+    cardinals = cardinals.convert_dtypes(dtype_backend="pyarrow")
     cardinals.columns = [flatten_col(c) for c in cardinals.columns]
     return cardinals
 
 
+@functools.lru_cache(maxsize=1)
+def get_con() -> duckdb.DuckDBPyConnection:
+    """
+    Returns the process-wide connection to the papal DuckDB database.
+
+    Sharing one connection between this module and the notebook avoids a
+    second connect() on the same database file.
+    """
+
+    return duckdb.connect(str(DUCKDB_FILE))
+
+
+def load_cardinals_table(
+    con: duckdb.DuckDBPyConnection | None = None, force_refresh: bool = False
+) -> None:
+    """
+    Creates (or replaces) the `cardinals` table in DuckDB.
+
+    A fresh Parquet cache is read by DuckDB directly, without building a
+    DataFrame. Otherwise the table from get_cardinals_data is handed over as
+    Arrow, so DuckDB reads its buffers instead of converting the frame column
+    by column.
+
+    Args:
+        con: The DuckDB connection to load into; defaults to get_con().
+        force_refresh: Passed through to get_cardinals_data.
+    """
+
+    if con is None:
+        con = get_con()
+
+    table_age = _table_cache_age()
+    if not force_refresh and table_age is not None and table_age <= PARQUET_CACHE_TTL:
+        print("Table loaded from cache.")
+        con.execute(
+            "CREATE OR REPLACE TABLE cardinals AS SELECT * FROM read_parquet(?)",
+            [str(PARQUET_CACHE_FILE)],
+        )
+        return
+
+    cardinals = get_cardinals_data(force_refresh)
+    cardinals_arrow = pa.Table.from_pandas(cardinals, preserve_index=False)
+    con.register("cardinals_arrow", cardinals_arrow)
+    try:
+        con.execute(
+            "CREATE OR REPLACE TABLE cardinals AS SELECT * FROM cardinals_arrow"
+        )
+    finally:
+        con.unregister("cardinals_arrow")
+
+
 def main(force_refresh: bool = False):
     cardinals_data = get_cardinals_data(force_refresh)
     print(cardinals_data.head())
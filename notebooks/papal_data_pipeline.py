@@ -9,10 +9,28 @@ app = marimo.App(width="medium")
 @app.cell
 def _():
     import marimo as mo
-    import duckdb
-    import pandas as pd
+    import hashlib
+    import tempfile
+    from pathlib import Path
 
-    return duckdb, mo
+    import hishel
+    import httpx
+    import pandas as pd
+    from hishel.httpx import SyncCacheTransport
+
+    from get_cardinal_data import get_con, load_cardinals_table
+
+    return (
+        Path,
+        SyncCacheTransport,
+        get_con,
+        hashlib,
+        hishel,
+        httpx,
+        load_cardinals_table,
+        mo,
+        tempfile,
+    )
 
 
 @app.cell
@@ -32,11 +50,37 @@ def _(mo):
 
 
 @app.cell
-def _(duckdb):
-    con = duckdb.connect("papal_data.duckdb")
+def _(get_con):
+    # Shared, cached connection (see get_cardinal_data.get_con)
+    con = get_con()
     return (con,)
 
 
+@app.cell
+def _(Path, SyncCacheTransport, hashlib, hishel, httpx, tempfile):
+    # HTTP client with an on-disk response cache, so re-running the notebook
+    # revalidates remote CSVs instead of downloading them again
+    http_client = httpx.Client(
+        transport=SyncCacheTransport(
+            next_transport=httpx.HTTPTransport(http2=True),
+            storage=hishel.SyncSqliteStorage(),  # .cache/hishel/hishel_cache.db
+        ),
+        follow_redirects=True,
+        timeout=30.0,
+    )
+
+    def fetch_csv_to_tmp(url: str) -> Path:
+        """Downloads a CSV through the cached client and returns its local path."""
+        resp = http_client.get(url)
+        resp.raise_for_status()
+        name = hashlib.sha1(url.encode()).hexdigest()
+        path = Path(tempfile.gettempdir()) / f"{name}.csv"
+        path.write_bytes(resp.content)
+        return path
+
+    return (fetch_csv_to_tmp,)
+
+
 @app.cell
 def _(mo):
     mo.md(
@@ -46,17 +90,21 @@ def _(mo):
         **Source:** [ksreyes/popes (GitHub)](https://github.com/ksreyes/popes)  
         **Raw CSV:** https://raw.githubusercontent.com/ksreyes/popes/master/popes.csv  
 
-        *Note: This table includes all popes from St. Peter to Pope Francis.*
+        *Note: This table includes all popes from St. Peter to Pope Francis.*  
+        *The CSV is downloaded through a disk-cached HTTP client, so re-runs only revalidate it with GitHub.*
         """
     )
     return
 
 
 @app.cell
-def _(con):
-    # Load popes CSV directly from GitHub into DuckDB
+def _(con, fetch_csv_to_tmp):
+    # Load popes CSV from GitHub (via the HTTP cache) into DuckDB
+    popes_csv_path = fetch_csv_to_tmp(
+        "https://raw.githubusercontent.com/ksreyes/popes/master/popes.csv"
+    )
 
-    con.execute("""
+    con.execute(f"""
     CREATE OR REPLACE TABLE popes AS
     SELECT
         number,
@@ -71,12 +119,13 @@ def _(con):
         age_end,
         tenure
     FROM read_csv(
-        'https://raw.githubusercontent.com/ksreyes/popes/master/popes.csv',
+        '{popes_csv_path}',
         nullstr=['NA']
     );
     """)
 
-    popes_df = con.sql("SELECT * FROM popes").df()
+    # Only materialise the preview rows; later cells query the table in SQL
+    popes_df = con.sql("SELECT * FROM popes LIMIT 20").df()
     return (popes_df,)
 
 
@@ -151,16 +200,19 @@ def _(mo):
 
 @app.cell
 def _(con):
-    # Update Francis's end date
-    con.execute("""
+    # Update Francis's end date and return the updated row in one statement
+    francis_row = con.execute(
+        """
     UPDATE popes
     SET
-        reign_end = '2025-04-21',
-        age_end = 88,
-        tenure = CAST(reign_end - reign_start AS DOUBLE) / 365.25
-    WHERE name = 'Francis';
-    """)
-    francis_row = con.execute("SELECT * FROM popes WHERE name = 'Francis'").fetchdf()
+        reign_end = $reign_end,
+        age_end = $age_end,
+        tenure = CAST(CAST($reign_end AS DATE) - reign_start AS DOUBLE) / 365.25
+    WHERE name = $name
+    RETURNING *;
+    """,
+        {"reign_end": "2025-04-21", "age_end": 88, "name": "Francis"},
+    ).fetchdf()
     return (francis_row,)
 
 
@@ -184,12 +236,13 @@ def _(mo):
 
 
 @app.cell
-def _(con):
+def _(con, fetch_csv_to_tmp):
     conclaves_csv_url = "https://raw.githubusercontent.com/YOUR-REPO/conclaves.csv"  # Replace with actual
     try:
+        conclaves_csv_path = fetch_csv_to_tmp(conclaves_csv_url)
         con.execute(f"""
             CREATE OR REPLACE TABLE conclaves AS
-            FROM '{conclaves_csv_url}'
+            FROM '{conclaves_csv_path}'
         """)
         conclaves_df = con.execute("SELECT * FROM conclaves LIMIT 5").fetchdf()
     except Exception as e:
@@ -210,20 +263,18 @@ def _(mo):
         ## 3. Cardinals Table
 
         **Source:** [Wikipedia: List of current cardinals](https://en.wikipedia.org/wiki/List_of_current_cardinals)  
-        *(You may need to pre-process or find a CSV version of this data. For demonstration, a placeholder URL is used below.)*
+        **Parquet cache:** `cardinals_page.parquet`, written by `get_cardinal_data.py`  
+
+        *Note: `load_cardinals_table` fetches and parses the Wikipedia tables (or reuses the cached table) and hands them to DuckDB as Arrow data.*
         """
     )
     return
 
 
 @app.cell
-def _(con):
-    cardinals_csv_url = "https://raw.githubusercontent.com/YOUR-REPO/cardinals.csv"  # Replace with actual
+def _(con, load_cardinals_table):
     try:
-        con.execute(f"""
-            CREATE OR REPLACE TABLE cardinals AS
-            FROM '{cardinals_csv_url}'
-        """)
+        load_cardinals_table(con)
         cardinals_df = con.execute("SELECT * FROM cardinals LIMIT 5").fetchdf()
     except Exception as e:
         cardinals_df = f"Could not load cardinals table: {e}"
@@ -250,12 +301,13 @@ def _(mo):
 
 
 @app.cell
-def _(con):
+def _(con, fetch_csv_to_tmp):
     documents_csv_url = "https://raw.githubusercontent.com/YOUR-REPO/papal_documents.csv"  # Replace with actual
     try:
+        documents_csv_path = fetch_csv_to_tmp(documents_csv_url)
         con.execute(f"""
             CREATE OR REPLACE TABLE papal_documents AS
-            FROM '{documents_csv_url}'
+            FROM '{documents_csv_path}'
         """)
         documents_df = con.execute("SELECT * FROM papal_documents LIMIT 5").fetchdf()
     except Exception as e:
@@ -277,7 +329,7 @@ def _(mo):
 
         - **Popes:** [ksreyes/popes (GitHub)](https://github.com/ksreyes/popes)
         - **Conclaves:** [Wikipedia: List of Papal Conclaves](https://en.wikipedia.org/wiki/List_of_papal_conclaves) *(CSV needed)*
-        - **Cardinals:** [Wikipedia: List of current cardinals](https://en.wikipedia.org/wiki/List_of_current_cardinals) *(CSV needed)*
+        - **Cardinals:** [Wikipedia: List of current cardinals](https://en.wikipedia.org/wiki/List_of_current_cardinals) *(parsed by `get_cardinal_data.py`)*
         - **Papal Documents:** [Vatican.va](https://www.vatican.va/content/vatican/en.html) *(CSV needed)*
 
         > Please ensure all data sources are cited and that you have permission to use and share these datasets.
@@ -29,7 +29,12 @@ def _():
 
 @app.cell
 def _(pd):
-    df = pd.DataFrame([])
+    df = pd.DataFrame(
+        {
+            "name": pd.Series(dtype="string[pyarrow]"),
+            "reign_start": pd.Series(dtype="datetime64[ns]"),
+        }
+    )
     return (df,)
 
 